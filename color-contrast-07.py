@@ -1,122 +1,145 @@
-import colorsys
-from math import pow
-from typing import Tuple
+from bisect import bisect_right
+from functools import lru_cache
+from math import floor
+from operator import itemgetter
 from datetime import datetime
 
-# Function to calculate relative luminance of a color
-def relative_luminance(rgb: Tuple[int, int, int]) -> float:
-    def adjust(c: float) -> float:
-        c = c / 255.0
-        return c / 12.92 if c <= 0.03928 else pow((c + 0.055) / 1.055, 2.4)
+# Stylesheet shared by every generated page
+HTML_STYLE = '<style>* {font-family: sans-serif; text-shadow: none;} .textwhite {color: white;} .textblack {color: black;} .bgwhite.result:hover {text-shadow: 1px 1px 1px #000000;} .bgblack.result:hover {text-shadow: 1px 1px 1px #ffffff;} .label {padding: 0.5em; display: block;} .pass100 {color: #000000; background-color: #9cffac;} .pass80 {color: #000000; background-color: #f2ff9c;} .pass60 {color: #000000; background-color: #ffdb9c} .fail {color: #000000; background-color: #ff9c9c;}</style>'
+
+# WCAG thresholds (AA Large, AA Normal, AAA); bisect_right over these gives a
+# bucket 0-3 that indexes the label tables below
+CONTRAST_THRESHOLDS = (3, 4.5, 7)
+LABEL_CLASSES = ("fail", "pass60", "pass80", "pass100")
+COMPLIANCE_LABELS = (
+    "Fail - 0% (< 3.0)",
+    "Pass - 60% (AA Large &ge; 3.0)",
+    "Pass - 80% (AA Normal &ge; 4.5)",
+    "Pass - 100% (AAA &ge; 7.0)",
+)
+# Extra inline style for summary entries in each passing bucket (failures are not summarised)
+SUMMARY_ENTRY_STYLES = (None, " font-size: 1.5em;", "", "")
+
+# Linearise one 8-bit sRGB channel
+def _adjust(c: int) -> float:
+    c = c / 255.0
+    return c / 12.92 if c <= 0.03928 else ((c + 0.055) / 1.055) ** 2.4
 
+# Linearised value for every 8-bit sRGB channel, so no pow() at lookup time
+SRGB_TO_LINEAR = tuple(_adjust(c) for c in range(256))
+
+# Function to calculate relative luminance of a color
+def relative_luminance(rgb: bytes) -> float:
     r, g, b = rgb
-    return 0.2126 * adjust(r) + 0.7152 * adjust(g) + 0.0722 * adjust(b)
-
-# Function to calculate contrast ratio
-def contrast_ratio(foreground: Tuple[int, int, int], background: Tuple[int, int, int]) -> float:
-    lum1 = relative_luminance(foreground)
-    lum2 = relative_luminance(background)
-    if lum1 > lum2:
-        return (lum1 + 0.05) / (lum2 + 0.05)
-    return (lum2 + 0.05) / (lum1 + 0.05)
-
-# Generate HTML table
-def generate_html(colors: list):
-    html = '<style>* {font-family: sans-serif; text-shadow: none;} .textwhite {color: white;} .textblack {color: black;} .bgwhite.result:hover {text-shadow: 1px 1px 1px #000000;} .bgblack.result:hover {text-shadow: 1px 1px 1px #ffffff;} .label {padding: 0.5em; display: block;} .pass100 {color: #000000; background-color: #9cffac;} .pass80 {color: #000000; background-color: #f2ff9c;} .pass60 {color: #000000; background-color: #ffdb9c} .fail {color: #000000; background-color: #ff9c9c;}</style>'
-    
-    # Helper function to determine text color
-    def get_text_color(hex_color):
-        rgb = tuple(int(hex_color.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
-        return "textwhite" if relative_luminance(rgb) < 0.5 else "textblack"
+    return 0.2126 * SRGB_TO_LINEAR[r] + 0.7152 * SRGB_TO_LINEAR[g] + 0.0722 * SRGB_TO_LINEAR[b]
+
+# Parse '#RRGGBB' into its three channel bytes in a single C-level call
+def hex_to_rgb(hex_color: str) -> bytes:
+    return bytes.fromhex(hex_color.lstrip('#'))
+
+# Cached luminance per hex string, so each palette color is only linearised once
+@lru_cache(maxsize=None)
+def lum_hex(hex_color: str) -> float:
+    return relative_luminance(hex_to_rgb(hex_color))
+
+# Helper function to determine text color
+def get_text_color(hex_color: str) -> str:
+    return "textwhite" if lum_hex(hex_color) < 0.5 else "textblack"
+
+# Helper function to determine text-shadow color
+def get_text_shadow(hex_color: str) -> str:
+    return "bgwhite" if lum_hex(hex_color) >= 0.5 else "bgblack"
 
-    # Helper function to determine text-shadow color
-    def get_text_shadow(hex_color):
-        rgb = tuple(int(hex_color.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
-        return "bgwhite" if relative_luminance(rgb) >= 0.5 else "bgblack"
+# Compute the full N x N matrix of contrast ratios up front. The ratio
+# is symmetric and 1.0 on the diagonal, so only the upper triangle is computed
+def compute_ratio_matrix(colors: list) -> list:
+    # Decode the whole palette in one bytes.fromhex call (3 bytes per color), and
+    # add the 0.05 flare term once per color, so each pair is a single divide
+    rgb = bytes.fromhex(''.join(hex_color.lstrip('#') for _, hex_color in colors))
+    offset_lums = [relative_luminance(rgb[k:k + 3]) + 0.05 for k in range(0, len(rgb), 3)]
+    n = len(offset_lums)
+    ratios = [[1.0] * n for _ in range(n)]
+    for i in range(n):
+        lum_i = offset_lums[i]
+        row = ratios[i]
+        for j in range(i + 1, n):
+            lum_j = offset_lums[j]
+            row[j] = ratios[j][i] = lum_i / lum_j if lum_i > lum_j else lum_j / lum_i
+    return ratios
+
+# Generate HTML table as a list of fragments, ready to be streamed to a file
+def generate_html(colors: list) -> list:
+    parts = [HTML_STYLE]
+    # Local names for what the N x N loop touches (LOAD_FAST instead of LOAD_GLOBAL/attribute lookups)
+    append = parts.append
+    compliance_labels = COMPLIANCE_LABELS
+    label_classes = LABEL_CLASSES
 
     # Store passing combinations for summary table
-    summary_data = {bg[1]: {"name": bg[0], "AAA": [], "AA": [], "AALarge": []} for bg in colors}
+    summary_data = {bg[1]: {"name": bg[0], "entries": []} for bg in colors}
+
+    # Per-color lookup tables and the ratio matrix, built once before the N x N loop
+    ratios = compute_ratio_matrix(colors)
+    buckets = [[bisect_right(CONTRAST_THRESHOLDS, ratio) for ratio in row] for row in ratios]
+    text_colors = [get_text_color(hex_color) for _, hex_color in colors]
+    text_shadows = [get_text_shadow(hex_color) for _, hex_color in colors]
 
     # Top row
-    html += '<h2>Main Contrast Table</h2>'
-    html += '<table border="0" style="border-collapse: collapse;">'
-    html += '<tr><th style="color: black;">BG &#8594;<br>FG &#8595;</th>'
-    for bg in colors:
-        text_color = get_text_color(bg[1])
-        html += f'<th class="{text_color}" style="background-color: {bg[1]};">{bg[0]}<br>{bg[1]}</th>'
-    html += '</tr>'
+    append('<h2>Main Contrast Table</h2>')
+    append('<table border="0" style="border-collapse: collapse;">')
+    append('<tr><th style="color: black;">BG &#8594;<br>FG &#8595;</th>')
+    for j, (bg_name, bg_hex) in enumerate(colors):
+        append(f'<th class="{text_colors[j]}" style="background-color: {bg_hex};">{bg_name}<br>{bg_hex}</th>')
+    append('</tr>')
     
     # Rows for each foreground color
-    for fg in colors:
-        text_color = get_text_color(fg[1])
-        html += f'<tr><td class="{text_color}" style="background-color: {fg[1]};">{fg[0]}<br>{fg[1]}</td>'
-        for bg in colors:
-            rgb_fg = tuple(int(fg[1].lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
-            rgb_bg = tuple(int(bg[1].lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
-            ratio = round(contrast_ratio(rgb_fg, rgb_bg), 3)
-
-            # Compliance check and store in summary data
-            if ratio >= 7:
-                summary_data[bg[1]]["AAA"].append((fg[0], fg[1], ratio))
-            elif ratio >= 4.5:
-                summary_data[bg[1]]["AA"].append((fg[0], fg[1], ratio))
-            elif ratio >= 3:
-                summary_data[bg[1]]["AALarge"].append((fg[0], fg[1], ratio))
-            
-            compliance = (
-                "Pass - 100% (AAA &ge; 7.0)" if ratio >= 7 else
-                "Pass - 80% (AA Normal &ge; 4.5)" if ratio >= 4.5 else
-                "Pass - 60% (AA Large &ge; 3.0)" if ratio >= 3 else
-                "Fail - 0% (< 3.0)"
-            )
-            labelclass = (
-                "pass100" if ratio >= 7 else
-                "pass80" if ratio >= 4.5 else
-                "pass60" if ratio >= 3 else
-                "fail"
-            )
-            text_shadow = get_text_shadow(bg[1])
-            html += (
-                f'<td style="background-color: {bg[1]}; color: {fg[1]}; padding: 1em;">'
-                f'<strong class="result {text_shadow}">{fg[0]} over {bg[0]}</strong>'
-                f'<br><span class="label {labelclass}">{compliance} with ratio {ratio}</span>'
-                f'</td>'
-            )
-        html += '</tr>'
+    for i, (fg_name, fg_hex) in enumerate(colors):
+        append(f'<tr><td class="{text_colors[i]}" style="background-color: {fg_hex};">{fg_name}<br>{fg_hex}</td>')
+        # Everything that depends only on the foreground is bound once per row
+        ratio_row = ratios[i]
+        bucket_row = buckets[i]
+        for j, (bg_name, bg_hex) in enumerate(colors):
+            ratio = ratio_row[j]
+            bucket = bucket_row[j]
+            # Truncate rather than round for display, so a ratio just under a threshold
+            # (e.g. 4.4996) never shows as the threshold it failed
+            ratio_text = f"{floor(ratio * 1000) / 1000:.3f}"
+
+            # Store passing combinations in summary data
+            if bucket:
+                summary_data[bg_hex]["entries"].append((fg_name, fg_hex, ratio, bucket, ratio_text))
+
+            compliance = compliance_labels[bucket]
+            labelclass = label_classes[bucket]
+            text_shadow = text_shadows[j]
+            append(f'<td style="background-color: {bg_hex}; color: {fg_hex}; padding: 1em;"><strong class="result {text_shadow}">{fg_name} over {bg_name}</strong><br><span class="label {labelclass}">{compliance} with ratio {ratio_text}</span></td>')
+        append('</tr>')
     
-    html += '</table>'
+    append('</table>')
     
     # Generate summary table
-    html += '<h2>Summary Table: Passing Combinations by Category</h2>'
-    html += '<table border="1" style="border-collapse: collapse;">'
-    html += '<tr><th style="color: black;">Background</th>'
-    html += '<th>AAA &ge; 7.0</th><th>AA Normal &ge; 4.5</th><th>AA Large &ge; 3.0</th></tr>'
+    append('<h2>Summary Table: Passing Combinations by Category</h2>')
+    append('<table border="1" style="border-collapse: collapse;">')
+    append('<tr><th style="color: black;">Background</th>')
+    append('<th>AAA &ge; 7.0</th><th>AA Normal &ge; 4.5</th><th>AA Large &ge; 3.0</th></tr>')
 
     for bg_hex, bg_data in summary_data.items():
-        html += f'<tr><td style="background-color: {bg_hex}; padding: 1em;" class="{get_text_color(bg_hex)}">{bg_data["name"]}<br>{bg_hex}</td>'
-        
-        # AAA Column
-        html += f'<td style="background-color: {bg_hex}">'
-        for fg_name, fg_hex, ratio in sorted(bg_data["AAA"], key=lambda x: x[2], reverse=True):
-            html += f'<div style="background-color: {bg_hex}; color: {fg_hex}; padding: 0.5em;">{fg_name} (Ratio: {ratio})</div>'
-        html += '</td>'
-        
-        # AA Column
-        html += f'<td style="background-color: {bg_hex}">'
-        for fg_name, fg_hex, ratio in sorted(bg_data["AA"], key=lambda x: x[2], reverse=True):
-            html += f'<div style="background-color: {bg_hex}; color: {fg_hex}; padding: 0.5em;">{fg_name} (Ratio: {ratio})</div>'
-        html += '</td>'
-        
-        # AA Large Column
-        html += f'<td style="background-color: {bg_hex}">'
-        for fg_name, fg_hex, ratio in sorted(bg_data["AALarge"], key=lambda x: x[2], reverse=True):
-            html += f'<div style="background-color: {bg_hex}; color: {fg_hex}; padding: 0.5em; font-size: 1.5em;">{fg_name} (Ratio: {ratio})</div>'
-        html += '</td>'
-        
-        html += '</tr>'
-
-    html += '</table>'
-    return html
+        append(f'<tr><td style="background-color: {bg_hex}; padding: 1em;" class="{get_text_color(bg_hex)}">{bg_data["name"]}<br>{bg_hex}</td>')
+
+        # Sort once by ratio (highest first), then split into the AAA, AA and AA Large columns
+        columns = ([], [], [], [])
+        for fg_name, fg_hex, ratio, bucket, ratio_text in sorted(bg_data["entries"], key=itemgetter(2), reverse=True):
+            columns[bucket].append(f'<div style="background-color: {bg_hex}; color: {fg_hex}; padding: 0.5em;{SUMMARY_ENTRY_STYLES[bucket]}">{fg_name} (Ratio: {ratio_text})</div>')
+
+        for bucket in (3, 2, 1):
+            append(f'<td style="background-color: {bg_hex}">')
+            parts.extend(columns[bucket])
+            append('</td>')
+
+        append('</tr>')
+
+    append('</table>')
+    return parts
 
 # Color palette with names and hex codes
 colors = [
@@ -138,14 +161,18 @@ colors = [
     ("Purple", "#3C2D57")
 ]
 
-html_output = generate_html(colors)
+def main():
+    html_parts = generate_html(colors)
+
+    # Generate timestamp for filename
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    filename = f"color_contrast_grid_{timestamp}.html"
 
-# Generate timestamp for filename
-timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-filename = f"color_contrast_grid_{timestamp}.html"
+    # Write to an HTML file
+    with open(filename, "w", buffering=1 << 20) as file:
+        file.writelines(html_parts)
 
-# Write to an HTML file
-with open(filename, "w") as file:
-    file.write(html_output)
+    print(f"HTML file '{filename}' generated.")
 
-print(f"HTML file '{filename}' generated.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
\ No newline at end of file
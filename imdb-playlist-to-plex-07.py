@@ -1,29 +1,20 @@
+# Dependencies are listed in imdb-playlist-to-plex-requirements.txt:
+#   pip install -r imdb-playlist-to-plex-requirements.txt
+# plexapi and rapidfuzz are imported where they are used, so --help and --instructions start quickly
 import sys
-import subprocess
 import argparse
-
-def install_package(package):
-	subprocess.check_call([sys.executable, "-m", "pip", "install", package])
-
-# Check and install required packages
-required_packages = ['plexapi', 'requests', 'fuzzywuzzy', 'colorama', 'python-Levenshtein']
-for package in required_packages:
-	try:
-		__import__(package.replace('-', '_'))  # Replace hyphen with underscore for import
-	except ImportError:
-		print(f"Installing {package}...")
-		install_package(package)
-
 import requests
-from plexapi.server import PlexServer
+from requests.adapters import HTTPAdapter
 import re
 import csv
+import atexit
+import threading
 import time
 import os
 import configparser
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from fuzzywuzzy import fuzz
-from fuzzywuzzy import process
 from colorama import init, Fore, Style
 
 CONFIG_FILE = 'plex_collection_config.ini'
@@ -31,6 +22,14 @@ CONFIG_FILE = 'plex_collection_config.ini'
 # Initialize colorama
 init()
 
+# Console (prefix, suffix) per log message type; anything else prints uncolored
+MESSAGE_COLORS = {
+	"SUCCESS": (Fore.GREEN, Style.RESET_ALL),
+	"ERROR": (Fore.RED, Style.RESET_ALL),
+	"WARNING": (Fore.YELLOW, Style.RESET_ALL)
+}
+NO_COLOR = ("", "")
+
 ### Plex server details - will be set via args or user input ###
 PLEX_URL = ''
 PLEX_TOKEN = ''
@@ -38,8 +37,22 @@ MOVIE_LIBRARY_NAME = ''
 CSV_FILE_PATH = ''
 IMDB_COLLECTION_NAME = ''
 LOG_FILE_PATH = ''
+LOG_FILE = None  # Open handle to LOG_FILE_PATH, kept for the whole run
+LOG_LOCK = threading.Lock()  # Keeps lines from background threads from interleaving
 REPORT_FILE_PATH = ''
 
+# Shared HTTP session so Plex requests reuse pooled keep-alive connections
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=16, pool_maxsize=32))
+SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32))
+REQUEST_TIMEOUT = 30  # Seconds to wait for a Plex API response
+ADD_COLLECTION_WORKERS = 8  # Concurrent add-to-collection requests
+ADD_COLLECTION_BATCH_SIZE = 200  # Movies tagged per add-to-collection request
+
+# IMDB ID patterns, compiled once: in an IMDB list URL, and in a Plex guid (imdb://tt0133093?lang=en)
+IMDB_URL_RE = re.compile(r'(tt\d+)')
+IMDB_GUID_RE = re.compile(r'imdb://([^?]+)')
+
 # Fuzzy matching thresholds
 TITLE_YEAR_MATCH_RATIO = 85  # Minimum match ratio for title + year
 TITLE_ONLY_MATCH_RATIO = 90  # Minimum match ratio for title only
@@ -71,6 +84,7 @@ def display_instructions():
 
 def get_existing_collections():
 	"""Get list of existing collections in the movie library"""
+	from plexapi.server import PlexServer
 	try:
 		plex = PlexServer(PLEX_URL, PLEX_TOKEN)
 		movie_library = plex.library.section(MOVIE_LIBRARY_NAME)
@@ -94,150 +108,187 @@ def parse_arguments():
 	return parser.parse_args()
 
 def initialize_logging():
-	"""Create log file with timestamp"""
-	global LOG_FILE_PATH, REPORT_FILE_PATH
+	"""Create log file with timestamp and keep it open for the rest of the run"""
+	global LOG_FILE_PATH, LOG_FILE, REPORT_FILE_PATH
 	timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 	LOG_FILE_PATH = f'plex_collection_log_{IMDB_COLLECTION_NAME}_{timestamp}.txt'
 	REPORT_FILE_PATH = f'plex_collection_report_{IMDB_COLLECTION_NAME}_{timestamp}.csv'
 	
-	with open(LOG_FILE_PATH, 'w', encoding='utf-8') as log_file:
-		log_file.write(f"Plex Collection Creation Log - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-		log_file.write(f"Collection Name: {IMDB_COLLECTION_NAME}\n")
-		log_file.write(f"CSV File: {CSV_FILE_PATH}\n")
-		log_file.write(f"Plex URL: {PLEX_URL}\n")
-		log_file.write(f"Plex Library: {MOVIE_LIBRARY_NAME}\n")
-		log_file.write("="*50 + "\n\n")
+	LOG_FILE = open(LOG_FILE_PATH, 'w', encoding='utf-8', buffering=8192)
+	atexit.register(LOG_FILE.close)
+	LOG_FILE.write(f"Plex Collection Creation Log - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+	LOG_FILE.write(f"Collection Name: {IMDB_COLLECTION_NAME}\n")
+	LOG_FILE.write(f"CSV File: {CSV_FILE_PATH}\n")
+	LOG_FILE.write(f"Plex URL: {PLEX_URL}\n")
+	LOG_FILE.write(f"Plex Library: {MOVIE_LIBRARY_NAME}\n")
+	LOG_FILE.write("="*50 + "\n\n")
 
 def log_message(message, print_to_console=True, message_type="INFO"):
 	"""Log messages to file and optionally print to console with colors"""
 	timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 	log_entry = f"[{timestamp}] {message}\n"
 	
-	with open(LOG_FILE_PATH, 'a', encoding='utf-8') as log_file:
-		log_file.write(log_entry)
-	
-	if print_to_console:
-		if message_type == "SUCCESS":
-			print(f"{Fore.GREEN}{message}{Style.RESET_ALL}")
-		elif message_type == "ERROR":
-			print(f"{Fore.RED}{message}{Style.RESET_ALL}")
-		elif message_type == "WARNING":
-			print(f"{Fore.YELLOW}{message}{Style.RESET_ALL}")
-		else:
-			print(message)
+	with LOG_LOCK:
+		# Messages logged before initialize_logging() (e.g. while prompting) only go to the console
+		if LOG_FILE:
+			LOG_FILE.write(log_entry)
+		
+		if print_to_console:
+			prefix, suffix = MESSAGE_COLORS.get(message_type, NO_COLOR)
+			print(f"{prefix}{message}{suffix}")
 
-def add_collection(library_key, rating_key, movie_title):
-	"""Add movie to collection and return success status"""
-	headers = {"X-Plex-Token": PLEX_TOKEN}
+def add_collection(library_key, rating_keys, movie_titles):
+	"""Add movies from one library section to collection in a single request and return success status"""
 	params = {
 		"type": 1,
-		"id": rating_key,
+		"id": ",".join(str(rating_key) for rating_key in rating_keys),
 		"collection[0].tag.tag": IMDB_COLLECTION_NAME,
 		"collection.locked": 1
 	}
 
 	url = f"{PLEX_URL}/library/sections/{library_key}/all"
 	try:
-		response = requests.put(url, headers=headers, params=params)
+		response = SESSION.put(url, params=params, timeout=REQUEST_TIMEOUT)
 		return response.status_code == 200
 	except Exception as e:
-		log_message(f"Error adding collection for {movie_title}: {str(e)}", message_type="ERROR")
+		log_message(f"Error adding collection for {', '.join(movie_titles)}: {str(e)}", message_type="ERROR")
 		return False
 
+def column_index(header, name):
+	"""Return the position of a CSV column, or None if the header doesn't have it"""
+	return header.index(name) if name in header else None
+
+def get_column(row, index, default=''):
+	"""Return a CSV row's value at a column position, or default if the column is missing"""
+	return row[index] if index is not None and index < len(row) else default
+
 def find_imdb_id(imdb_url):
 	"""Extract id from imdb_url"""
-	match = re.search(r'(tt\d+)', imdb_url)
+	match = IMDB_URL_RE.search(imdb_url)
 	return match.group(0) if match else None
 
+def find_guid_imdb_id(guid):
+	"""Extract IMDB id from a Plex guid"""
+	match = IMDB_GUID_RE.search(guid)
+	return match.group(1) if match else None
+
+def parse_year(year):
+	"""Return year as an int, or None if it is missing or not a number"""
+	try:
+		return int(year)
+	except (TypeError, ValueError):
+		return None
+
 def clean_title(title):
 	"""Clean title for better matching"""
 	if not title:
 		return ""
 	return title.lower().replace("the ", "").strip()
 
-def find_movie_by_title_year(movies, title, year, original_title=None):
-	"""Find movie by title and year with fuzzy matching"""
-	# Try exact match first
-	for movie in movies:
-		if (movie.title.lower() == title.lower() or 
-			(original_title and movie.title.lower() == original_title.lower())):
-			if str(movie.year) == str(year):
-				return movie
+def build_movie_index(movies):
+	"""Extract the fields used for matching from the Plex movies in one pass, as parallel lists"""
+	movie_index = {
+		'movies': movies,
+		'clean_titles': [],
+		'years': [],
+		'imdb_ids': [],
+		'by_year': defaultdict(list),
+		'by_title': defaultdict(list)
+	}
+	for i, movie in enumerate(movies):
+		title = movie.title
+		year = parse_year(movie.year)
+		movie_index['clean_titles'].append(clean_title(title))
+		movie_index['years'].append(year)
+		movie_index['imdb_ids'].append(find_guid_imdb_id(movie.guid))
+		# Bucket by year so title + year matching only scans one year, and by
+		# lowercased title so exact matches are a dict lookup
+		movie_index['by_year'][year].append(i)
+		movie_index['by_title'][title.lower()].append(i)
+	return movie_index
+
+def best_fuzzy_match(choices, title, original_title=None):
+	"""Return (position, score) of the best fuzzy match in choices on title or original title"""
+	from rapidfuzz import fuzz, process
+	# Empty queries are kept: like fuzzywuzzy, RapidFuzz scores ratio('', '') as 100
+	queries = [clean_title(title), clean_title(original_title)] if original_title else [clean_title(title)]
+	if not choices:
+		return None, 0
+	
+	# Score as rounded ints like fuzzywuzzy did, so the match thresholds accept the same
+	# movies: find the best rounded score, then the earliest choice reaching it on either title
+	best_score = max(round(process.extractOne(query, choices, scorer=fuzz.ratio, processor=None)[1]) for query in queries)
+	if best_score <= 0:
+		return None, 0
+	position = min(
+		index
+		for query in queries
+		for _, score, index in process.extract(query, choices, scorer=fuzz.ratio, processor=None, score_cutoff=best_score - 0.5, limit=None)
+		if round(score) == best_score
+	)
+	return position, best_score
+
+def find_movie_by_title_year(movie_index, title, year, original_title=None):
+	"""Find movie by title and year (an int, or None if unknown) with fuzzy matching"""
+	if year is None:
+		return None
 	
-	# Try fuzzy matching
-	best_match = None
-	highest_score = 0
+	# Exact title hits are a dict lookup, so they skip fuzzy matching entirely;
+	# earliest movie in the library wins
+	by_title = movie_index['by_title']
+	years = movie_index['years']
+	exact_keys = (title.lower(), original_title.lower()) if original_title else (title.lower(),)
+	exact_matches = [i for key in exact_keys for i in by_title.get(key, ()) if years[i] == year]
+	if exact_matches:
+		return movie_index['movies'][min(exact_matches)]
 	
-	for movie in movies:
-		# Compare with main title
-		title_score = fuzz.ratio(clean_title(movie.title), clean_title(title))
-		
-		# Compare with original title if available
-		original_score = 0
-		if original_title:
-			original_score = fuzz.ratio(clean_title(movie.title), clean_title(original_title))
-		
-		current_score = max(title_score, original_score)
-		
-		# Only consider if year matches
-		if str(movie.year) == str(year) and current_score > highest_score:
-			highest_score = current_score
-			best_match = movie
+	# Try fuzzy matching, only considering movies from the same year
+	candidates = movie_index['by_year'].get(year, [])
+	clean_titles = movie_index['clean_titles']
+	position, highest_score = best_fuzzy_match([clean_titles[i] for i in candidates], title, original_title)
 	
-	if best_match and highest_score >= TITLE_YEAR_MATCH_RATIO:
+	if position is not None and highest_score >= TITLE_YEAR_MATCH_RATIO:
+		best_match = movie_index['movies'][candidates[position]]
 		log_message(f"Fuzzy matched '{title}' ({year}) to '{best_match.title}' ({best_match.year}) with score {highest_score}", message_type="WARNING")
 		return best_match
 	
 	return None
 
-def find_movie_by_title(movies, title, original_title=None):
+def find_movie_by_title(movie_index, title, original_title=None):
 	"""Find movie by title only with fuzzy matching"""
-	best_match = None
-	highest_score = 0
+	position, highest_score = best_fuzzy_match(movie_index['clean_titles'], title, original_title)
 	
-	for movie in movies:
-		title_score = fuzz.ratio(clean_title(movie.title), clean_title(title))
-		
-		original_score = 0
-		if original_title:
-			original_score = fuzz.ratio(clean_title(movie.title), clean_title(original_title))
-		
-		current_score = max(title_score, original_score)
-		
-		if current_score > highest_score:
-			highest_score = current_score
-			best_match = movie
-	
-	if best_match and highest_score >= TITLE_ONLY_MATCH_RATIO:
+	if position is not None and highest_score >= TITLE_ONLY_MATCH_RATIO:
+		best_match = movie_index['movies'][position]
 		log_message(f"Title-only matched '{title}' to '{best_match.title}' with score {highest_score}", message_type="WARNING")
 		return best_match
 	
 	return None
 
 def find_existing_collection_items(plex, collection_name):
-	"""Find all movies that are already in the specified collection"""
-	existing_items = {}
+	"""Return the rating keys and IMDB IDs of all movies already in the specified collection"""
+	existing_keys = set()
 	
 	# Search all movie sections
 	try:
 		movie_library = plex.library.section(MOVIE_LIBRARY_NAME)
 		collection_items = movie_library.search(collection=collection_name)
 		
-		# Create a map of both IMDB IDs and rating keys
+		# Collect both IMDB IDs and rating keys in one set of membership keys
 		for item in collection_items:
 			# Add by rating key
-			existing_items[item.ratingKey] = item
+			existing_keys.add(item.ratingKey)
 			
 			# Add by IMDB ID if available
-			if 'imdb://' in item.guid:
-				imdb_id = item.guid.split('imdb://')[1].split('?')[0]
-				existing_items[imdb_id] = item
+			imdb_id = find_guid_imdb_id(item.guid)
+			if imdb_id:
+				existing_keys.add(imdb_id)
 				
 		log_message(f"Found {len(collection_items)} movies already in collection '{collection_name}'")
-		return existing_items
+		return existing_keys
 	except Exception as e:
 		log_message(f"Error finding existing collection items: {str(e)}", message_type="ERROR")
-		return {}
+		return set()
 
 def generate_report(report_data):
 	"""Generate CSV report of processed movies"""
@@ -261,8 +312,10 @@ def generate_report(report_data):
 
 def verify_plex_connection():
 	"""Verify connection to Plex server"""
+	from plexapi.server import PlexServer
+	SESSION.headers.update({"X-Plex-Token": PLEX_TOKEN})
 	try:
-		plex = PlexServer(PLEX_URL, PLEX_TOKEN)
+		plex = PlexServer(PLEX_URL, PLEX_TOKEN, session=SESSION)
 		log_message(f"Connected to Plex server at {PLEX_URL}")
 		return plex
 	except Exception as e:
@@ -280,13 +333,26 @@ def run_imdb_list():
 	if not plex:
 		return []
 
+	# Fetch the Plex library and the current collection members in the background while
+	# the CSV is read; both are slow server round trips that don't depend on the CSV
+	log_message(f"Retrieving movies from Plex library: {MOVIE_LIBRARY_NAME}")
+	prefetch = ThreadPoolExecutor(max_workers=2)
+	all_movies_future = prefetch.submit(lambda: plex.library.section(MOVIE_LIBRARY_NAME).all())
+	existing_keys_future = prefetch.submit(find_existing_collection_items, plex, IMDB_COLLECTION_NAME)
+	prefetch.shutdown(wait=False)  # No more work to submit; threads exit when both fetches finish
+
 	# Read local CSV file
 	log_message(f"Reading IMDB list from: {CSV_FILE_PATH}")
 	try:
 		with open(CSV_FILE_PATH, mode='r', encoding='utf-8') as csv_file:
-			reader = csv.DictReader(csv_file)
-			rows = list(reader)
-			url_column = 'URL' if 'URL' in reader.fieldnames else 'url'
+			# Plain rows plus column positions resolved once from the header, no dict per row
+			reader = csv.reader(csv_file)
+			header = next(reader)
+			url_index = column_index(header, 'URL' if 'URL' in header else 'url')
+			title_index = column_index(header, 'Title')
+			original_title_index = column_index(header, 'Original Title')
+			year_index = column_index(header, 'Year')
+			rows = [row for row in reader if row]
 			
 			log_message(f"Found {len(rows)} movies in the CSV file")
 	except Exception as e:
@@ -294,10 +360,8 @@ def run_imdb_list():
 		return []
 
 	# Get all movies from Plex library
-	log_message(f"Retrieving movies from Plex library: {MOVIE_LIBRARY_NAME}")
 	try:
-		movie_library = plex.library.section(MOVIE_LIBRARY_NAME)
-		all_movies = movie_library.all()
+		all_movies = all_movies_future.result()
 		log_message(f"Found {len(all_movies)} movies in Plex library")
 	except Exception as e:
 		log_message(f"Error accessing Plex library: {str(e)}", message_type="ERROR")
@@ -305,13 +369,15 @@ def run_imdb_list():
 		return []
 
 	# Find existing collection items
-	existing_collection_items = find_existing_collection_items(plex, IMDB_COLLECTION_NAME)
+	existing_keys = existing_keys_future.result()
+
+	# Read titles, years and IMDB IDs off the Plex objects once, rather than once per CSV row
+	movie_index = build_movie_index(all_movies)
 
 	# Create IMDB ID to movie mapping
 	imdb_map = {}
-	for movie in all_movies:
-		if 'imdb://' in movie.guid:
-			imdb_id = movie.guid.split('imdb://')[1].split('?')[0]
+	for movie, imdb_id in zip(all_movies, movie_index['imdb_ids']):
+		if imdb_id:
 			imdb_map[imdb_id] = movie
 
 	# Process each movie from CSV in order
@@ -324,11 +390,12 @@ def run_imdb_list():
 	ordered_movies = []
 	
 	for row in rows:
-		imdb_url = row.get(url_column, '')
+		imdb_url = get_column(row, url_index)
 		imdb_id = find_imdb_id(imdb_url)
-		title = row.get('Title', 'Unknown')
-		original_title = row.get('Original Title', '')
-		year = row.get('Year', '')
+		title = get_column(row, title_index, 'Unknown')
+		original_title = get_column(row, original_title_index)
+		year = get_column(row, year_index)
+		year_int = parse_year(year)
 		
 		report_item = {
 			'title': title,
@@ -358,17 +425,17 @@ def run_imdb_list():
 		
 		# If not found by IMDB ID, try title + year
 		if not movie:
-			movie = find_movie_by_title_year(all_movies, title, year, original_title)
+			movie = find_movie_by_title_year(movie_index, title, year_int, original_title)
 			if movie:
 				match_method = "Title + Year Fuzzy Match"
 		
 		# If still not found, try title only
 		if not movie:
-			movie = find_movie_by_title(all_movies, title, original_title)
+			movie = find_movie_by_title(movie_index, title, original_title)
 			if movie:
 				match_method = "Title Only Fuzzy Match"
 				# Verify year isn't too different
-				if year and abs(int(movie.year) - int(year)) > 2:
+				if year_int is not None and abs(int(movie.year) - year_int) > 2:
 					log_message(f"Rejected title-only match for {title} due to year mismatch (Plex: {movie.year}, CSV: {year})", message_type="WARNING")
 					movie = None
 		
@@ -384,11 +451,7 @@ def run_imdb_list():
 			continue
 
 		# Check if the movie is already in the collection
-		already_in_collection = False
-		if movie.ratingKey in existing_collection_items:
-			already_in_collection = True
-		elif imdb_id in existing_collection_items:
-			already_in_collection = True
+		already_in_collection = movie.ratingKey in existing_keys or imdb_id in existing_keys
 
 		if already_in_collection:
 			status = "SKIPPED:"
@@ -411,14 +474,37 @@ def run_imdb_list():
 			'original_position': len(ordered_movies)  # Maintain original order
 		})
 
-	# Second pass - add to collection in order
+	# Second pass - add to collection. Movies are tagged in batches, one request per
+	# library section and chunk of ADD_COLLECTION_BATCH_SIZE movies
+	items_by_section = defaultdict(list)
+	for item in ordered_movies:
+		items_by_section[item['movie'].librarySectionID].append(item)
+	batches = []
+	for library_key, section_items in items_by_section.items():
+		for start in range(0, len(section_items), ADD_COLLECTION_BATCH_SIZE):
+			batches.append((library_key, section_items[start:start + ADD_COLLECTION_BATCH_SIZE]))
+	
+	def add_batch(batch):
+		library_key, batch_items = batch
+		return add_collection(
+			library_key,
+			[batch_item['movie'].ratingKey for batch_item in batch_items],
+			[batch_item['movie'].title for batch_item in batch_items]
+		)
+	
+	# The requests are network-bound, so batches run concurrently
+	with ThreadPoolExecutor(max_workers=ADD_COLLECTION_WORKERS) as executor:
+		for (_, batch_items), success in zip(batches, executor.map(add_batch, batches)):
+			for batch_item in batch_items:
+				batch_item['success'] = success
+	
+	# Report in the original list order
 	for item in ordered_movies:
+		success = item['success']
 		movie = item['movie']
 		report_item = item['report_item']
 		match_method = item['match_method']
 		
-		# Try to add to collection
-		success = add_collection(movie.librarySectionID, movie.ratingKey, movie.title)
 		if success:
 			status = "ADDED:"
 			report_item.update({
@@ -454,6 +540,7 @@ def run_imdb_list():
 
 def test_plex_connection():
 	"""Test connection to Plex server and validate library name"""
+	from plexapi.server import PlexServer
 	try:
 		plex = PlexServer(PLEX_URL, PLEX_TOKEN)
 		print(f"{Fore.GREEN}✓ Successfully connected to Plex server{Style.RESET_ALL}")
@@ -1,24 +1,68 @@
 import subprocess
 import json
 import os
+import bisect
+
+# Probe in-process with PyAV when available, to avoid spawning ffprobe
+try:
+    import av
+except ImportError:
+    # PyAV not installed, fall back to ffprobe
+    av = None
+
+# Parse ffprobe's JSON with orjson when available
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    # orjson not installed, use the standard library parser
+    json_loads = json.loads
+
+# Resolution tiers, from SD up to 4K, split at the (inclusive) upper pixel count of each lower tier
+PIXEL_CUTOFFS = [1280 * 720, 1920 * 1080, 3840 * 2160]
+RESOLUTION_NAMES = ['SD', '720p', '1080p', '4K']
+
+# Per resolution tier, the (inclusive) upper bitrate in kbps for Low and Medium; anything above is High
+BITRATE_CUTOFFS = [
+    (1000, 2500),    # SD (640x480 or lower)
+    (2500, 5000),    # 720p (1280x720)
+    (5000, 10000),   # 1080p (1920x1080)
+    (10000, 20000)   # 4K (3840x2160)
+]
+BITRATE_CATEGORIES = ['Low', 'Medium', 'High']
+
+def get_video_bitrate_and_resolution_pyav(file_path):
+    """
+    Extract video bitrate and resolution in-process using PyAV (libavformat)
+    """
+    with av.open(file_path) as container:
+        video_stream = container.streams.video[0]
+        bitrate = (video_stream.bit_rate or 0) / 1000  # Convert to kbps
+        return bitrate, video_stream.width, video_stream.height
 
 def get_video_bitrate_and_resolution(file_path):
     """
-    Extract video bitrate and resolution using ffprobe
+    Extract video bitrate and resolution using PyAV, or ffprobe if PyAV is unavailable or fails
     """
+    if av is not None:
+        try:
+            return get_video_bitrate_and_resolution_pyav(file_path)
+        except Exception:
+            pass  # Fall back to ffprobe below
+    
     try:
-        # Run ffprobe to get video stream information in JSON format
+        # Run ffprobe to get only the needed video stream fields in JSON format
         result = subprocess.run([
             'ffprobe', 
             '-v', 'quiet', 
             '-print_format', 'json', 
-            '-show_streams', 
+            '-show_entries', 'stream=bit_rate,width,height', 
             '-select_streams', 'v:0', 
             file_path
         ], capture_output=True, text=True)
         
         # Parse the JSON output
-        probe_data = json.loads(result.stdout)
+        probe_data = json_loads(result.stdout)
         
         # Extract bitrate and resolution
         video_stream = probe_data['streams'][0]
@@ -43,42 +87,11 @@ def categorize_bitrate(bitrate, width, height):
     # Calculate pixels
     pixels = width * height
     
-    # Bitrate categories for different resolutions
-    categories = {
-        # 4K (3840x2160)
-        (3840 * 2160, float('inf')): {
-            'low': (10000, 'Low bitrate for 4K'),
-            'medium': (20000, 'Medium bitrate for 4K'),
-            'high': (float('inf'), 'High bitrate for 4K')
-        },
-        # 1080p (1920x1080)
-        (1920 * 1080, 3840 * 2160): {
-            'low': (5000, 'Low bitrate for 1080p'),
-            'medium': (10000, 'Medium bitrate for 1080p'),
-            'high': (float('inf'), 'High bitrate for 1080p')
-        },
-        # 720p (1280x720)
-        (1280 * 720, 1920 * 1080): {
-            'low': (2500, 'Low bitrate for 720p'),
-            'medium': (5000, 'Medium bitrate for 720p'),
-            'high': (float('inf'), 'High bitrate for 720p')
-        },
-        # SD (640x480 or lower)
-        (0, 1280 * 720): {
-            'low': (1000, 'Low bitrate for SD'),
-            'medium': (2500, 'Medium bitrate for SD'),
-            'high': (float('inf'), 'High bitrate for SD')
-        }
-    }
-    
-    # Find the right resolution category
-    for (min_pixels, max_pixels), thresholds in categories.items():
-        if min_pixels < pixels <= max_pixels:
-            for category, (threshold, description) in thresholds.items():
-                if bitrate <= threshold:
-                    return f"{category.capitalize()} Bitrate ({description})"
-    
-    return "Unable to categorize"
+    # Find the resolution tier, then the bitrate category within it
+    tier = bisect.bisect_left(PIXEL_CUTOFFS, pixels)
+    resolution = RESOLUTION_NAMES[tier]
+    category = BITRATE_CATEGORIES[bisect.bisect_left(BITRATE_CUTOFFS[tier], bitrate)]
+    return f"{category} Bitrate ({category} bitrate for {resolution})"
 
 def main():
     # Prompt for file path
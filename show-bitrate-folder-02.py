@@ -1,72 +1,203 @@
 import subprocess
 import json
 import os
+import bisect
+import shutil
+import sqlite3
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from functools import lru_cache
+from operator import attrgetter
 from pathlib import Path
+from typing import NamedTuple
+
+# Probe in-process with PyAV when available, to avoid spawning ffprobe
+try:
+    import av
+except ImportError:
+    # PyAV not installed, fall back to ffprobe
+    av = None
 
 # Common video file extensions
 VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.mpg', '.mpeg'}
 
-def get_video_info(file_path):
+# Resolution tiers, from SD up to 4K, split at the (inclusive) upper pixel count of each lower tier
+PIXEL_CUTOFFS = [1280 * 720, 1920 * 1080, 3840 * 2160]
+RESOLUTION_NAMES = ['SD', '720p', '1080p', '4K']
+
+# Per resolution tier, the (exclusive) upper bitrate in kbps for Low and Medium; anything above is High
+BITRATE_CUTOFFS = [
+    (1000, 2500),    # SD
+    (2500, 5000),    # 720p
+    (5000, 10000),   # 1080p
+    (10000, 20000)   # 4K
+]
+BITRATE_CATEGORIES = ['Low', 'Medium', 'High']
+
+# Display order for the results: 4K, 1080p, 720p, SD, each with High, Medium, Low
+CATEGORY_ORDER = [f"{res} - {quality}" for res in reversed(RESOLUTION_NAMES) for quality in reversed(BITRATE_CATEGORIES)]
+
+# Files smaller than this (in bytes) are thumbnails, samples or broken stubs,
+# and aren't worth probing
+MIN_VIDEO_SIZE = 512 * 1024
+
+# Number of videos to probe at once; probing mostly waits on the disk or on
+# ffprobe, so run more workers than there are cores
+PROBE_WORKERS = min(32, (os.cpu_count() or 2) * 2)
+
+# Resolve ffprobe on PATH once, rather than on every spawn
+FFPROBE = shutil.which('ffprobe') or 'ffprobe'
+
+# Only the container header is needed, so cap how much of each file is read
+# (bytes) and analyzed (microseconds) when probing
+PROBE_SIZE = '1000000'
+ANALYZE_DURATION = '1000000'
+
+# Probe results from earlier runs, reused while a file's size and mtime are unchanged
+PROBE_CACHE_FILE = Path.home() / ".show_bitrate_folder_cache.sqlite3"
+
+class VideoInfo(NamedTuple):
     """
-    Extract video bitrate and resolution using ffprobe with modified bitrate calculation
+    Analysis result for one video; bitrate is in kbps
     """
-    try:
-        # First command to get stream information
-        result = subprocess.run([
-            'ffprobe', 
-            '-v', 'quiet', 
-            '-print_format', 'json', 
-            '-show_streams', 
-            '-select_streams', 'v:0', 
-            file_path
-        ], capture_output=True, text=True)
-        
-        # Second command specifically for bitrate using -count_packets
-        bitrate_result = subprocess.run([
-            'ffprobe',
-            '-v', 'quiet',
-            '-select_streams', 'v:0',
-            '-show_entries', 'format=duration,size',
-            '-print_format', 'json',
-            file_path
-        ], capture_output=True, text=True)
-        
-        probe_data = json.loads(result.stdout)
-        bitrate_data = json.loads(bitrate_result.stdout)
-        
-        video_stream = probe_data['streams'][0]
-        width = int(video_stream.get('width', 0))
-        height = int(video_stream.get('height', 0))
-        
-        # Calculate bitrate from file size and duration
+    bitrate: float
+    width: int
+    height: int
+    path: str
+    filename: str
+    size_mb: float
+
+def probe_video_pyav(file_path):
+    """
+    Read resolution, duration and bitrates in-process using PyAV (libavformat)
+    """
+    with av.open(file_path, options={'probesize': PROBE_SIZE, 'analyzeduration': ANALYZE_DURATION}) as container:
+        video_stream = container.streams.video[0]
+        duration = container.duration / av.time_base if container.duration else None
+        return (video_stream.width, video_stream.height, duration,
+                video_stream.bit_rate or 0, container.bit_rate or 0)
+
+def probe_video_ffprobe(file_path):
+    """
+    Read resolution, duration and bitrates using ffprobe
+    """
+    # One command for both the video stream and the container format
+    result = subprocess.run([
+        FFPROBE, 
+        '-v', 'quiet', 
+        '-print_format', 'json', 
+        '-show_streams', 
+        '-show_format', 
+        '-select_streams', 'v:0', 
+        '-probesize', PROBE_SIZE, 
+        '-analyzeduration', ANALYZE_DURATION, 
+        file_path
+    ], capture_output=True)
+    
+    probe_data = json.loads(result.stdout)
+    
+    video_stream = probe_data['streams'][0]
+    format_info = probe_data.get('format', {})
+    duration = format_info.get('duration')
+    return (int(video_stream.get('width', 0)), int(video_stream.get('height', 0)),
+            float(duration) if duration is not None else None,
+            float(video_stream.get('bit_rate', 0)), float(format_info.get('bit_rate', 0)))
+
+def probe_video(file_path, size):
+    """
+    Return (width, height, bitrate in kbps) using PyAV, or ffprobe if PyAV is unavailable or fails;
+    size is the file size in bytes, already known from the folder walk
+    """
+    probe = None
+    if av is not None:
         try:
-            duration = float(bitrate_data['format']['duration'])
-            size_bits = float(bitrate_data['format']['size']) * 8
-            bitrate = (size_bits / duration) / 1000  # Convert to kbps
-        except (KeyError, ZeroDivisionError):
-            # Fallback method using direct bit_rate if available
-            bitrate = float(video_stream.get('bit_rate', 0)) / 1000
-            if bitrate == 0:
-                # Second fallback: try format bitrate
-                format_result = subprocess.run([
-                    'ffprobe',
-                    '-v', 'quiet',
-                    '-print_format', 'json',
-                    '-show_format',
-                    file_path
-                ], capture_output=True, text=True)
-                format_data = json.loads(format_result.stdout)
-                bitrate = float(format_data['format'].get('bit_rate', 0)) / 1000
+            probe = probe_video_pyav(file_path)
+        except Exception:
+            pass  # Fall back to ffprobe below
+    if probe is None:
+        probe = probe_video_ffprobe(file_path)
+    width, height, duration, stream_bit_rate, format_bit_rate = probe
+    
+    # Calculate bitrate from file size and duration
+    if duration:
+        bitrate = (size * 8 / duration) / 1000  # Convert to kbps
+    else:
+        # Fallback method using direct bit_rate if available
+        bitrate = stream_bit_rate / 1000
+        if bitrate == 0:
+            # Second fallback: try format bitrate
+            bitrate = format_bit_rate / 1000
+    
+    return width, height, bitrate
+
+@lru_cache(maxsize=4096)
+def _probe_video_cached(file_path, size, mtime):
+    """
+    Memoize probe_video() for this run; mtime is only there so a changed file misses
+    """
+    return probe_video(file_path, size)
+
+def connect_probe_cache():
+    """
+    Open the probe cache database, creating its table if needed
+    """
+    connection = sqlite3.connect(PROBE_CACHE_FILE)
+    connection.execute(
+        'CREATE TABLE IF NOT EXISTS probes '
+        '(path TEXT PRIMARY KEY, size INTEGER, mtime REAL, width INTEGER, height INTEGER, bitrate REAL)'
+    )
+    return connection
+
+def load_probe_cache():
+    """
+    Load cached probe results as {path: (size, mtime, width, height, bitrate)}
+    """
+    try:
+        with closing(connect_probe_cache()) as connection:
+            rows = connection.execute('SELECT path, size, mtime, width, height, bitrate FROM probes')
+            return {row[0]: tuple(row[1:]) for row in rows}
+    except sqlite3.Error as e:
+        print(f"Could not read probe cache {PROBE_CACHE_FILE}: {e}")
+        return {}
+
+def save_probe_cache(new_probes):
+    """
+    Store probe results from this run, replacing older results for the same paths
+    """
+    if not new_probes:
+        return
+    try:
+        with closing(connect_probe_cache()) as connection, connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?)',
+                ((path,) + values for path, values in new_probes.items())
+            )
+    except sqlite3.Error as e:
+        print(f"Could not update probe cache {PROBE_CACHE_FILE}: {e}")
+
+def get_video_info(file_path, size, mtime, cached_probes, new_probes):
+    """
+    Extract video bitrate and resolution, reusing cached_probes while the file's size and
+    mtime (from the folder walk) are unchanged and recording fresh results in new_probes
+    """
+    try:
+        cache_key = os.path.abspath(file_path)
+        cached = cached_probes.get(cache_key)
+        if cached and cached[:2] == (size, mtime):
+            width, height, bitrate = cached[2:]
+        else:
+            width, height, bitrate = _probe_video_cached(cache_key, size, mtime)
+            new_probes[cache_key] = (size, mtime, width, height, bitrate)
         
-        return {
-            'bitrate': bitrate,
-            'width': width,
-            'height': height,
-            'path': file_path,
-            'filename': os.path.basename(file_path),
-            'size_mb': os.path.getsize(file_path) / (1024 * 1024)  # Convert to MB
-        }
+        return VideoInfo(
+            bitrate=bitrate,
+            width=width,
+            height=height,
+            path=file_path,
+            filename=os.path.basename(file_path),
+            size_mb=size / (1024 * 1024)  # Convert to MB
+        )
     
     except Exception as e:
         print(f"\nError analyzing video {file_path}: {e}")
@@ -76,119 +207,101 @@ def categorize_bitrate(video_info):
     """
     Categorize bitrate based on resolution and bitrate
     """
-    width = video_info['width']
-    height = video_info['height']
-    bitrate = video_info['bitrate']
-    pixels = width * height
-    
-    # Resolution categories and their bitrate thresholds
-    categories = {
-        '4K': {
-            'pixels': (3840 * 2160, float('inf')),
-            'thresholds': {
-                'Low': (0, 10000),
-                'Medium': (10000, 20000),
-                'High': (20000, float('inf'))
-            }
-        },
-        '1080p': {
-            'pixels': (1920 * 1080, 3840 * 2160),
-            'thresholds': {
-                'Low': (0, 5000),
-                'Medium': (5000, 10000),
-                'High': (10000, float('inf'))
-            }
-        },
-        '720p': {
-            'pixels': (1280 * 720, 1920 * 1080),
-            'thresholds': {
-                'Low': (0, 2500),
-                'Medium': (2500, 5000),
-                'High': (5000, float('inf'))
-            }
-        },
-        'SD': {
-            'pixels': (0, 1280 * 720),
-            'thresholds': {
-                'Low': (0, 1000),
-                'Medium': (1000, 2500),
-                'High': (2500, float('inf'))
-            }
-        }
-    }
-    
-    # Find resolution category
-    resolution_category = None
-    for res_name, res_info in categories.items():
-        min_pixels, max_pixels = res_info['pixels']
-        if min_pixels < pixels <= max_pixels:
-            resolution_category = res_name
-            break
-    
-    if not resolution_category:
+    pixels = video_info.width * video_info.height
+    bitrate = video_info.bitrate
+    if pixels <= 0 or bitrate < 0:
         return None
     
-    # Find bitrate category
-    for bitrate_category, (min_rate, max_rate) in categories[resolution_category]['thresholds'].items():
-        if min_rate <= bitrate < max_rate:
-            return f"{resolution_category} - {bitrate_category}"
-    
-    return None
+    # Find the resolution tier, then the bitrate category within it
+    tier = bisect.bisect_left(PIXEL_CUTOFFS, pixels)
+    quality = BITRATE_CATEGORIES[bisect.bisect_right(BITRATE_CUTOFFS[tier], bitrate)]
+    return f"{RESOLUTION_NAMES[tier]} - {quality}"
 
 def find_video_files(folder_path):
     """
-    Recursively find all video files in the given folder
+    Recursively find all video files in the given folder, as (path, size, mtime) tuples
     """
     video_files = []
-    for path in Path(folder_path).rglob('*'):
-        if path.suffix.lower() in VIDEO_EXTENSIONS:
-            video_files.append(str(path))
+    pending_folders = [folder_path]
+    while pending_folders:
+        subfolders = []
+        try:
+            with os.scandir(pending_folders.pop()) as entries:
+                for entry in entries:
+                    # Extension check is on the name alone, so non-video files are never stat'd
+                    if entry.is_dir(follow_symlinks=False):
+                        subfolders.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in VIDEO_EXTENSIONS:
+                        try:
+                            # Cached from the directory listing on Windows
+                            stat = entry.stat()
+                        except OSError:
+                            continue  # Skip broken links and files we can't stat
+                        video_files.append((entry.path, stat.st_size, stat.st_mtime))
+        except PermissionError:
+            continue  # Skip folders we can't read
+        # Push in reverse so subfolders are walked depth first, in listing order
+        pending_folders.extend(reversed(subfolders))
     return video_files
 
 def analyze_folder(folder_path):
     """
-    Analyze all videos in a folder and return categorized results
+    Analyze all videos in a folder and return categorized results, each sorted by bitrate
     """
     print(f"Scanning folder: {folder_path}")
     
     # Find all video files
     video_files = find_video_files(folder_path)
+    print(f"Found {len(video_files)} video files")
+    
+    # Skip tiny files without probing them
+    skipped_files = len(video_files)
+    video_files = [video_file for video_file in video_files if video_file[1] >= MIN_VIDEO_SIZE]
+    skipped_files -= len(video_files)
+    if skipped_files:
+        print(f"Skipping {skipped_files} files smaller than {MIN_VIDEO_SIZE // 1024} KB")
     total_files = len(video_files)
-    print(f"Found {total_files} video files")
     
-    # Analyze each video
+    # Analyze videos in parallel; each worker thread just waits on its own
+    # ffprobe process. Progress updates as each video finishes, so one slow
+    # file doesn't hold it up
+    cached_probes = load_probe_cache()
+    new_probes = {}
+    video_infos = [None] * total_files
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as executor:
+        futures = {
+            executor.submit(get_video_info, *video_file, cached_probes, new_probes): index
+            for index, video_file in enumerate(video_files)
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            print(f"\rAnalyzed video {i}/{total_files}: {os.path.basename(video_files[index][0])}", end='')
+            video_infos[index] = future.result()
+    save_probe_cache(new_probes)
+    
+    # Sort once by bitrate (highest to lowest), so every category fills up already sorted;
+    # the sort is stable, so videos with equal bitrates keep listing in folder order
+    video_infos = sorted(filter(None, video_infos), key=attrgetter('bitrate'), reverse=True)
     categorized_videos = defaultdict(list)
-    for i, file_path in enumerate(video_files, 1):
-        print(f"\rAnalyzing video {i}/{total_files}: {os.path.basename(file_path)}", end='')
-        
-        video_info = get_video_info(file_path)
-        if video_info:
-            category = categorize_bitrate(video_info)
-            if category:
-                categorized_videos[category].append(video_info)
+    for video_info in video_infos:
+        category = categorize_bitrate(video_info)
+        if category:
+            categorized_videos[category].append(video_info)
     
     print("\nAnalysis complete!")
     return categorized_videos
 
 def display_results(categorized_videos):
     """
-    Display categorized videos sorted by bitrate
+    Display categorized videos, already sorted by bitrate
     """
     print("\nVideo Analysis Results:")
     print("=" * 100)
     
-    # Sort categories in order: 4K, 1080p, 720p, SD, each with High, Medium, Low
-    category_order = []
-    for res in ['4K', '1080p', '720p', 'SD']:
-        for quality in ['High', 'Medium', 'Low']:
-            category_order.append(f"{res} - {quality}")
-    
     # Display results for each category
-    for category in category_order:
+    for category in CATEGORY_ORDER:
         if category in categorized_videos:
             videos = categorized_videos[category]
-            # Sort videos by bitrate (highest to lowest)
-            videos.sort(key=lambda x: x['bitrate'], reverse=True)
             
             print(f"\n{category} Quality Videos:")
             print("-" * 100)
@@ -196,10 +309,10 @@ def display_results(categorized_videos):
             print("-" * 100)
             
             for video in videos:
-                filename = video['filename']
+                filename = video.filename
                 if len(filename) > 47:
                     filename = filename[:44] + "..."
-                print(f"{filename:<50} {video['width']}x{video['height']:<15} {video['bitrate']:>8.0f}k {video['size_mb']:>8.1f}MB")
+                print(f"{filename:<50} {video.width}x{video.height:<15} {video.bitrate:>8.0f}k {video.size_mb:>8.1f}MB")
 
 def main():
     # Prompt for folder path